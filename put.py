@@ -3,8 +3,6 @@
 import os
 import argparse
 
-import put.ui.file_functions
-
 
 def parse_arguments():
     parser = argparse.ArgumentParser()
@@ -15,6 +13,8 @@ def parse_arguments():
 
 def main():
     args = parse_arguments()
+    # imported here so that argument parsing (e.g. --help) does not pay for loading urwid
+    import put.ui.file_functions
     put.ui.file_functions.FileFunctions(args.dir).main()
 
 
@@ -1,11 +1,10 @@
 #!/usr/bin/env python3
 
-import datetime
-import functools
-import math
+import operator
 import os
 import shutil
 import subprocess
+import time
 
 
 class Editor:
@@ -20,41 +19,79 @@ class Editor:
         # cmdstr = f"{self.editorcmd} {target}"
         # os.system(cmdstr)
         cmd = [self.editorcmd, target]
-        process = subprocess.Popen(cmd, env=os.environ)
+        process = subprocess.Popen(cmd)
         process.wait()
 
 
 class FileMetadata:
-    def __init__(self, wd, path):
-        self.basename = path
-        self.name = os.path.join(wd, path)
-        self.islink = os.path.islink(self.name)
-        self.isbrokenlink = True if self.islink and not os.path.exists(os.readlink(self.name)) else False
-        self.isdir = False if self.isbrokenlink else os.path.isdir(self.name)
-        self.size = 0 if self.isbrokenlink else os.path.getsize(self.name)
-
-    def modification_time(self):
-        t = os.path.getmtime(self.name)
-        return datetime.datetime.fromtimestamp(t)
+    def __init__(self, wd_prefix, basename, islink, isdir, isbrokenlink, size, mtime):
+        self.wd_prefix = wd_prefix
+        self.basename = basename
+        self.islink = islink
+        self.isdir = isdir
+        self.isbrokenlink = isbrokenlink
+        self.size = size
+        self.mtime = mtime
+        self._columns = self._rendered = None
+
+    @classmethod
+    def from_dirent(cls, wd_prefix, entry):
+        """Build metadata from an os.DirEntry, reusing its cached stat"""
+        islink = entry.is_symlink()
+        try:
+            isdir = entry.is_dir()
+        except OSError:
+            isdir = False
+        try:
+            st = entry.stat()
+        except OSError:
+            # dangling target, symlink loop, permission denied, ...
+            # mtime None marks the stat as failed, size and mtime are shown as N/A
+            return cls(wd_prefix, entry.name, islink, isdir, islink, 0, None)
+        return cls(wd_prefix, entry.name, islink, isdir, False, st.st_size, st.st_mtime)
+
+    @property
+    def name(self):
+        # full path is only needed for syscalls, so build it on demand
+        return self.wd_prefix + self.basename
 
     def render(self, maxnamelen):
+        if self._rendered is None or self._rendered[0] != maxnamelen:
+            self._rendered = (maxnamelen, self._render(maxnamelen))
+        return self._rendered[1]
+
+    def columns(self):
+        # size and mtime columns don't depend on the name column width
+        if self._columns is None:
+            if self.isbrokenlink or self.mtime is None:
+                self._columns = f"{'N/A':>10}  N/A"
+            else:
+                # time.strftime on a struct_time skips building a datetime per row
+                mtime = time.strftime("%Y-%m-%d %H:%M", time.localtime(self.mtime))
+                self._columns = f"{self.size:>10}  {mtime}"
+        return self._columns
+
+    def _render(self, maxnamelen):
         rendername = f"{self.basename}/" if self.isdir else self.basename
-        name = f"{rendername}\t".expandtabs(maxnamelen + 2)
-        size = '{:>10}'.format('N/A' if self.isbrokenlink else self.size)
-        mtime = 'N/A' if self.isbrokenlink else self.modification_time().strftime("%Y-%m-%d %H:%M")
-        return name + size + "  " + mtime
+        return f"{rendername:<{maxnamelen + 2}}{self.columns()}"
+
+
+SIZE_UNITS = (('bytes', 0), ('kB', 0), ('MB', 1), ('GB', 1), ('TB', 1), ('PB', 1))
 
 
 # TODO cache stats
 def sizeof_fmt(num):
     """Human readable file size"""
-    unit_list = list(zip(['bytes', 'kB', 'MB', 'GB', 'TB', 'PB'], [0, 0, 1, 1, 1, 1]))
     if num > 1:
-        exponent = min(int(math.log(num, 1024)), len(unit_list) - 1)
-        quotient = float(num) / 1024 ** exponent
-        unit, num_decimals = unit_list[exponent]
-        format_string = '{:.%sf} {}' % num_decimals
-        return format_string.format(quotient, unit)
+        # integer log2 // 10 is the base-1024 exponent
+        exponent = min((num.bit_length() - 1) // 10, len(SIZE_UNITS) - 1)
+        quotient = num / (1 << 10 * exponent)
+        # carry into the next unit rather than printing e.g. '1024.0 TB'
+        if round(quotient, SIZE_UNITS[exponent][1]) >= 1024 and exponent < len(SIZE_UNITS) - 1:
+            exponent += 1
+            quotient /= 1024
+        unit, num_decimals = SIZE_UNITS[exponent]
+        return f'{quotient:.{num_decimals}f} {unit}'
     if num == 0:
         return '0 bytes'
     if num == 1:
@@ -64,28 +101,43 @@ def sizeof_fmt(num):
 class FileManager:
     def __init__(self, workdir):
         self.wd = workdir
-        self.files = self.selected_files = None
+        self.wd_prefix = None
+        self.files = self.metadata = self.selected_files = None
         self.total = self.used = self.free = 0
         self.max_filename_len = self.total_size = self.selected_size = 0
         self.change_dir(workdir)
 
     def change_dir(self, workdir):
         self.wd = workdir
+        self.wd_prefix = os.path.join(workdir, '')
         self.refresh()
 
     def refresh(self):
-        self.total, self.used, self.free = shutil.disk_usage(self.wd)
-
+        # disk usage of the new directory is filled in by refresh_disk_usage()
+        self.total = self.used = self.free = 0
         # TODO different sorts
-        #self.files = sorted([f for f in os.listdir(self.wd) if os.path.isfile(os.path.join(self.wd, f))])
-        self.files = sorted([f for f in os.listdir(self.wd)])
-        self.max_filename_len = max(list(map(lambda x: len(x), self.files))) if self.files else 12
-        self.total_size = 0
+        with os.scandir(self.wd) as it:
+            entries = list(it)
+        # sort computes each key once; attrgetter avoids a Python lambda call per entry
+        entries.sort(key=operator.attrgetter('name'))
+        # DirEntry caches stat results, so no extra syscalls per file
+        self.metadata = [FileMetadata.from_dirent(self.wd_prefix, entry) for entry in entries]
+        self.files = [metadata.basename for metadata in self.metadata]
+        # reductions run inside the sum/max builtins, not in a Python loop
+        self.max_filename_len = max(map(len, self.files), default=12)
         self.recalculate_total_files_size()
 
         self.selected_files = set()
         self.selected_size = 0
 
+    def refresh_disk_usage(self):
+        # statvfs() may block on network filesystems, callers can run this in a thread
+        wd = self.wd
+        usage = shutil.disk_usage(wd)
+        # discard the result if the directory changed in the meantime
+        if wd == self.wd:
+            self.total, self.used, self.free = usage
+
     def file_count(self):
         return len(self.files)
 
@@ -93,30 +145,30 @@ class FileManager:
         return len(self.selected_files)
 
     def recalculate_total_files_size(self):
-        self.total_size = self.recalculate_files_size(self.files)
-
-    def recalculate_selected_files_size(self):
-        self.selected_size = self.recalculate_files_size(self.selected_file_paths())
+        self.total_size = sum(map(operator.attrgetter('size'), self.metadata))
 
     def selected_file_paths(self):
         return list(map(lambda i: self.files[i], self.selected_files))
 
-    def recalculate_files_size(self, files):
-        return functools.reduce(lambda x, y: x + y, list(
-            map(lambda x: FileMetadata(self.wd, x).size, files))) if files else 0
-
     def get_path(self, idx):
-        return os.path.join(self.wd, self.files[idx])
+        return self.wd_prefix + self.files[idx]
 
     def select_file(self, idx):
+        if idx in self.selected_files:
+            return
         self.selected_files.add(idx)
-        self.recalculate_selected_files_size()
+        self.selected_size += self.metadata[idx].size
 
     def unselect_file(self, idx):
         self.selected_files.remove(idx)
-        self.recalculate_selected_files_size()
+        self.selected_size -= self.metadata[idx].size
 
     def delete_selected_files(self):
-        for idx in self.selected_files:
+        # update the listing in place instead of rescanning the directory;
+        # going from the back keeps the remaining indexes valid
+        for idx in sorted(self.selected_files, reverse=True):
             os.unlink(self.get_path(idx))
-        self.refresh()
+            self.unselect_file(idx)
+            self.total_size -= self.metadata[idx].size
+            del self.files[idx]
+            del self.metadata[idx]
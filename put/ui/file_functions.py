@@ -4,18 +4,23 @@ import os
 import signal
 
 import pathlib
+import threading
 
 import urwid
 
 import put.fm.file_manager
+import put.ui.lines_unicode as lines
+# import put.ui.lines_7bit as lines
 
 
 class MainLoop(urwid.MainLoop):
-    def exit_signal_handler(self, frame):
-        raise urwid.ExitMainLoop()
+    def __init__(self, *args, **kwargs):
+        super(MainLoop, self).__init__(*args, **kwargs)
+        signal.signal(signal.SIGINT, self.exit_signal_handler)
+        signal.signal(signal.SIGTSTP, self.exit_signal_handler)
 
-    signal.signal(signal.SIGINT, exit_signal_handler)
-    signal.signal(signal.SIGTSTP, exit_signal_handler)
+    def exit_signal_handler(self, signum, frame):
+        raise urwid.ExitMainLoop()
 
 
 class SelectableText(urwid.Text):
@@ -72,36 +77,8 @@ class FileFunctions(urwid.WidgetPlaceholder):
         ('columns', 'white', 'dark green', 'bold')
     ]
     palette = palette_blue
-    lines_unicode = {
-        "tlcorner": u'┌',
-        "tline": u'─',
-        "lline": u'│',
-        "trcorner": u'┐',
-        "blcorner": u'└',
-        "rline": u'│',
-        "bline": u'─',
-        "brcorner": u'┘',
-        "lconnector": u'├',
-        "rconnector": u'┤'
-    }
-    lines_7bit = {
-        "tlcorner": u'+',
-        "tline": u'-',
-        "lline": u'|',
-        "trcorner": u'+',
-        "blcorner": u'+',
-        "rline": u'|',
-        "bline": u'-',
-        "brcorner": u'+',
-        "lconnector": u'+',
-        "rconnector": u'+'
-    }
-    l = lines_unicode
-
-    # l = lines_7bit
-
-    def metamapper(self, x):
-        metadata = put.fm.file_manager.FileMetadata(self.fm.wd, x)
+
+    def metamapper(self, metadata):
         attrmap = 'dir' if metadata.isdir else 'file'
         focusmap = 'dir_focus' if metadata.isdir else 'file_focus'
         return urwid.AttrMap(SelectableText(metadata.render(self.fm.max_filename_len)), attr_map=attrmap, focus_map=focusmap)
@@ -113,7 +90,7 @@ class FileFunctions(urwid.WidgetPlaceholder):
         self.fm = put.fm.file_manager.FileManager(wd)
         self.appname_line = urwid.Text(self.app_title, 'left')
 
-        self.module_fill = urwid.SolidFill(self.l.get("tline", u'─'))
+        self.module_fill = urwid.SolidFill(lines.TLINE)
         self.module_line = urwid.Text(self.module_title, 'center')
         self.module_overlay = urwid.Overlay(self.module_line, self.module_fill, 'center', len(self.module_title), 'top',
                                             'pack')
@@ -121,13 +98,13 @@ class FileFunctions(urwid.WidgetPlaceholder):
         self.path_line = urwid.AttrWrap(urwid.Text(f"Path={self.fm.wd}", 'left'), 'body')
         # TODO grid?
         self.column_titles = urwid.AttrWrap(
-            urwid.Text('Name\t      Size  Last Modified'.expandtabs(self.fm.max_filename_len + 2)), 'columns')
+            urwid.Text(f"{'Name':<{self.fm.max_filename_len + 2}}      Size  Last Modified"), 'columns')
         self.header = urwid.Pile([self.appname_line,
                                   (1, self.module_overlay),
                                   self.path_line,
                                   self.column_titles])
 
-        self.metacontent = None
+        self.row_widgets = None
         self.listbox = None
         self.listwalker = None
         self.update_file_list()
@@ -142,18 +119,37 @@ class FileFunctions(urwid.WidgetPlaceholder):
              ('key', "F8"), "=directory LIST argument  ", ('key', "F9"), "=file SELECTion argument  ", ('key', "F10"),
              "=change path"], 'center')
         self.menubox = urwid.LineBox(self.menu, title='', title_align='center',
-                                     tlcorner=self.l.get("lconnector", u'├'),
-                                     tline=self.l.get("tline", u'─'),
-                                     lline=self.l.get("lline", u'│'),
-                                     trcorner=self.l.get("rconnector", u'┤'),
-                                     blcorner=self.l.get("blcorner", u'└'),
-                                     rline=self.l.get("rline", u'│'),
-                                     bline=self.l.get("bline", u'─'),
-                                     brcorner=self.l.get("brcorner", u'┘'))
-
-        self.statbox = None
+                                     tlcorner=lines.LCONNECTOR,
+                                     tline=lines.TLINE,
+                                     lline=lines.LLINE,
+                                     trcorner=lines.RCONNECTOR,
+                                     blcorner=lines.BLCORNER,
+                                     rline=lines.RLINE,
+                                     bline=lines.BLINE,
+                                     brcorner=lines.BRCORNER)
+
+        self.stat_listed = urwid.Text('', 'left')
+        self.stat_selected = urwid.Text('', 'left')
+        self.stat_subdir = urwid.Text('', 'left')
+        self.stat_available = urwid.Text('', 'left')
+        self.update_directory_stats()
         self.update_statbox()
 
+        stat_pile_left = urwid.Pile([self.stat_listed, self.stat_selected])
+        stat_pile_right = urwid.Pile([self.stat_subdir, self.stat_available])
+        stats = urwid.Columns([stat_pile_left, stat_pile_right])
+
+        colorstats = urwid.AttrWrap(stats, 'foot')
+        self.statbox = urwid.LineBox(colorstats, title='', title_align='center',
+                                     tlcorner=lines.TLCORNER,
+                                     tline=lines.TLINE,
+                                     lline=lines.LLINE,
+                                     trcorner=lines.TRCORNER,
+                                     blcorner='',
+                                     rline=lines.RLINE,
+                                     bline='',
+                                     brcorner='')
+
         self.footer = urwid.Pile([self.statbox, self.menubox])
 
         self.view = urwid.Frame(
@@ -161,80 +157,85 @@ class FileFunctions(urwid.WidgetPlaceholder):
             header=urwid.AttrWrap(self.header, 'main'),
             footer=urwid.AttrWrap(self.footer, 'main'))
 
-        self.loop = urwid.MainLoop(self.view, self.palette,
-                                   unhandled_input=self.unhandled_input)
+        self.loop = MainLoop(self.view, self.palette,
+                             unhandled_input=self.unhandled_input)
+        self.disk_usage_pipe = self.loop.watch_pipe(self.disk_usage_ready)
+        self.update_disk_usage()
 
     def update_file_list(self):
-        self.metacontent = list(map(self.metamapper, self.fm.files))
-        self.listwalker = urwid.SimpleFocusListWalker(self.metacontent)
+        self.row_widgets = list(map(self.metamapper, self.fm.metadata))
+        self.listwalker = urwid.SimpleFocusListWalker(self.row_widgets)
         self.listbox = ViListBox(self.listwalker)
 
     def update_body(self):
         self.view.body = urwid.AttrWrap(self.listbox, 'body')
         #self.view.render()
 
-    # TODO extend LineBox to provide update functionality?
+    # stat widgets are created once in __init__, only their text changes
+    def update_directory_stats(self):
+        # these only change when a directory is (re)loaded
+        self.stat_listed.set_text(
+            '{:>24}'.format(f'{self.fm.file_count()} files LISTed   = ') + f'{render_size(self.fm.total_size)}')
+        self.stat_subdir.set_text(
+            '{:>24}'.format(f'{self.fm.file_count()} files in sub-dir = ') + f'{render_size(self.fm.total_size)}')
+        self.update_available_stat()
+
+    def update_available_stat(self):
+        self.stat_available.set_text('{:>24}'.format(f'Available on volume = ') + f'{render_size(self.fm.free)}')
+
     def update_statbox(self):
-        stat_listed = urwid.Text(
-            '{:>24}'.format(f'{self.fm.file_count()} files LISTed   = ') + f'{render_size(self.fm.total_size)}',
-            'left')
-        stat_selected = urwid.Text('{:>24}'.format(
-            f'{self.fm.selected_count()} files SELECTed = ') + f'{render_size(self.fm.selected_size)}', 'left')
-        stat_subdir = urwid.Text(
-            '{:>24}'.format(f'{self.fm.file_count()} files in sub-dir = ') + f'{render_size(self.fm.total_size)}',
-            'left')
-        stat_available = urwid.Text('{:>24}'.format(f'Available on volume = ') + f'{render_size(self.fm.free)}',
-                                    'left')
-
-        stat_pile_left = urwid.Pile([stat_listed, stat_selected])
-        stat_pile_right = urwid.Pile([stat_subdir, stat_available])
-        stats = urwid.Columns([stat_pile_left, stat_pile_right])
+        self.stat_selected.set_text('{:>24}'.format(
+            f'{self.fm.selected_count()} files SELECTed = ') + f'{render_size(self.fm.selected_size)}')
 
-        colorstats = urwid.AttrWrap(stats, 'foot')
-        self.statbox = urwid.LineBox(colorstats, title='', title_align='center',
-                                     tlcorner=self.l.get("tlcorner", u'┌'),
-                                     tline=self.l.get("tline", u'─'),
-                                     lline=self.l.get("lline", u'│'),
-                                     trcorner=self.l.get("trcorner", u'┐'),
-                                     blcorner='',
-                                     rline=self.l.get("rline", u'│'),
-                                     bline='',
-                                     brcorner='')
+    def update_disk_usage(self):
+        # don't hold up the file list on statvfs(), the footer is updated when it returns
+        threading.Thread(target=self.refresh_disk_usage, daemon=True).start()
+
+    def refresh_disk_usage(self):
+        try:
+            self.fm.refresh_disk_usage()
+        except OSError:
+            # e.g. the directory was removed meanwhile, leave the stat as it is
+            pass
+        # wake up the main loop, urwid widgets must not be touched from this thread
+        os.write(self.disk_usage_pipe, b'\n')
+
+    def disk_usage_ready(self, _data):
+        self.update_available_stat()
 
     def update_footer(self):
         self.update_statbox()
-        self.footer = urwid.Pile([self.statbox, self.menubox])
-        self.view.footer = urwid.AttrMap(self.footer, 'main')
 
     def focus_file_path(self):
         _focus_widget, idx = self.listwalker.get_focus()
         path = self.fm.get_path(idx)
         return path
 
+    def set_row_attrs(self, idx, attrmap, focusmap):
+        # restyle the existing row widget in place rather than replacing it
+        row = self.row_widgets[idx]
+        row.set_attr_map({None: attrmap})
+        row.set_focus_map({None: focusmap})
+
     def select(self):
         _focus_widget, idx = self.listwalker.get_focus()
         self.fm.select_file(idx)
-        metadata = put.fm.file_manager.FileMetadata(self.fm.wd, self.fm.files[idx])
+        metadata = self.fm.metadata[idx]
         attrmap = 'broken_link_sel' if metadata.isbrokenlink else ('dir_sel' if metadata.isdir else 'file_sel')
         focusmap = 'broken_link_focus_sel' if metadata.isbrokenlink else ('dir_focus_sel' if metadata.isdir else 'file_focus_sel')
-        self.listwalker[idx] = urwid.AttrMap(
-            SelectableText(metadata.render(self.fm.max_filename_len)),
-            attr_map=attrmap, focus_map=focusmap)
+        self.set_row_attrs(idx, attrmap, focusmap)
         self.listwalker.set_focus((idx + 1) % len(self.listwalker))
         self.update_footer()
 
     def unselect(self):
-        _focus_widget, idx = self.  listwalker.get_focus()
+        _focus_widget, idx = self.listwalker.get_focus()
         if idx not in self.fm.selected_files:
             return
         self.fm.unselect_file(idx)
-        metadata = put.fm.file_manager.FileMetadata(self.fm.wd, self.fm.files[idx])
-        filename = metadata.render(self.fm.max_filename_len)
+        metadata = self.fm.metadata[idx]
         attrmap = 'broken_link' if metadata.isbrokenlink else ('dir' if metadata.isdir else 'file')
         focusmap = 'broken_link_focus' if metadata.isbrokenlink else ('dir_focus' if metadata.isdir else 'file_focus')
-        self.listwalker[idx] = urwid.AttrMap(
-            SelectableText(filename),
-            attr_map=attrmap, focus_map=focusmap)
+        self.set_row_attrs(idx, attrmap, focusmap)
         self.listwalker.set_focus((idx + 1) % len(self.listwalker))
         self.update_footer()
 
@@ -247,7 +248,9 @@ class FileFunctions(urwid.WidgetPlaceholder):
             self.fm.change_dir(path)
             self.update_file_list()
             self.update_body()
+            self.update_directory_stats()
             self.update_footer()
+            self.update_disk_usage()
 
 
     def delete_selected_files(self):
@@ -270,7 +273,9 @@ class FileFunctions(urwid.WidgetPlaceholder):
             self.delete_selected_files()
             self.update_file_list()
             self.update_body()
+            self.update_directory_stats()
             self.update_footer()
+            self.update_disk_usage()
             return
         if k in ('e', 'E'):
             self.invoke_editor()
@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+
+TLCORNER = u'+'
+TLINE = u'-'
+LLINE = u'|'
+TRCORNER = u'+'
+BLCORNER = u'+'
+RLINE = u'|'
+BLINE = u'-'
+BRCORNER = u'+'
+LCONNECTOR = u'+'
+RCONNECTOR = u'+'